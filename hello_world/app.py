@@ -1,42 +1,79 @@
 import json
 import logging
+import orjson
 import os
+import time
 from typing import Any, Dict, List
 import datetime
-from config.aws_client import aws_clients
-from services.s3_service import S3Service
-from services.rekognition_service import RekognitionService
-from services.bedrock_service import BedrockService
-from services.multiimagedamage_analyzer import MultiImageDamageAnalyzer
+from concurrent.futures import ThreadPoolExecutor
+from config.aws_client import get_client, get_thread_local_client, prewarm_aws_clients
 
 # Constants
 SUCCESS_STATUS_CODE = 200
 ERROR_STATUS_CODE = 500
 CONTENT_TYPE_JSON = "application/json"
 
-# Configure logging
+# Configure logging exactly once per process; copy the handler list so
+# removeHandler doesn't mutate the list being iterated
 logger = logging.getLogger()
-if logger.handlers:
-    for handler in logger.handlers:
+if not getattr(logger, '_damage_analysis_configured', False):
+    for handler in list(logger.handlers):
         logger.removeHandler(handler)
 
-logging.basicConfig(
-    format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
-    datefmt='%Y-%m-%d:%H:%M:%S',
-    level=logging.INFO
-)
+    logging.basicConfig(
+        format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+        datefmt='%Y-%m-%d:%H:%M:%S',
+        level=logging.INFO
+    )
+    logger._damage_analysis_configured = True
+
+# Lazy singletons: service modules are imported and wired on first use so a
+# cold start only pays for what the invocation actually touches, and warm
+# invocations reuse the cached objects
+_SERVICES = None
+_ANALYZER = None
+
+# Module-level worker pool so warm invocations reuse the same threads (and
+# therefore the same thread-local boto3 clients) instead of rebuilding both
+_IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('MAX_IMAGE_WORKERS', '8')))
+
+# Opt-in cold-start prewarm: resolves credentials/endpoints and primes a
+# TLS session at init time instead of on the first image (set
+# PREWARM_AWS_CLIENTS=1 in the function environment to enable)
+if os.getenv('PREWARM_AWS_CLIENTS') == '1':
+    prewarm_aws_clients()
 
 def initialize_services():
-    """Initialize all services"""
-    try:
-        return {
-            's3': S3Service(aws_clients['s3']),
-            'rekognition': RekognitionService(aws_clients['rekognition']),
-            'bedrock': BedrockService(aws_clients['bedrock'])
-        }
-    except Exception as e:
-        logger.error(f"Failed to initialize services: {str(e)}")
-        raise
+    """Build (once) and return the cached services"""
+    global _SERVICES, _ANALYZER
+    if _SERVICES is None:
+        try:
+            from services.s3_service import S3Service
+            from services.rekognition_service import RekognitionService
+            from services.bedrock_service import BedrockService
+            from services.multiimagedamage_analyzer import MultiImageDamageAnalyzer
+
+            _SERVICES = {
+                # S3 takes the bulk of the per-image calls; a per-thread
+                # client keeps fan-out workers off one shared pool
+                's3': S3Service(client_factory=lambda: get_thread_local_client('s3')),
+                'rekognition': RekognitionService(get_client('rekognition')),
+                'bedrock': BedrockService(get_client('bedrock'))
+            }
+            _ANALYZER = MultiImageDamageAnalyzer(
+                s3_service=_SERVICES['s3'],
+                rekognition_service=_SERVICES['rekognition'],
+                bedrock_service=_SERVICES['bedrock']
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize services: {str(e)}")
+            raise
+    return _SERVICES
+
+def get_analyzer():
+    """Build (once) and return the cached analyzer"""
+    initialize_services()
+    return _ANALYZER
 
 def create_error_response(error_message: str, status_code: int = ERROR_STATUS_CODE) -> Dict:
     """Create standardized error response."""
@@ -52,16 +89,21 @@ def format_analysis_results(results: Dict, analysis_timestamp: str) -> List[Dict
 
     formatted_results = []
 
-    # Debug logging
-    logger.info(f"Results type: {type(results)}")
-    logger.info(f"Results content: {results}")
+    # Debug logging (gated so production INFO level skips the serialization)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Results type: {type(results)}")
+        logger.debug(f"Results content: {results}")
 
     # Process a single result dictionary instead of a list
-    damage_labels = results.get('damage_labels', [])
+    damage_labels = results.get('damage_labels') or []
 
-    # Extract confidence scores if available
-    confidence_scores = [label.get('Confidence', 0.0) for label in damage_labels]
-    average_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
+    # Average confidence in a single pass without an intermediate list
+    total_confidence = 0.0
+    label_count = 0
+    for label in damage_labels:
+        total_confidence += label.get('Confidence', 0.0)
+        label_count += 1
+    average_confidence = total_confidence / label_count if label_count else 0.0
 
     analysis_entry = {
         "source_image": results.get('source_key', ''),
@@ -73,7 +115,8 @@ def format_analysis_results(results: Dict, analysis_timestamp: str) -> List[Dict
     }
 
     logger.info(
-        f"Analysis completed for image {results.get('source_key', '')}",
+        "Analysis completed for image %s",
+        results.get('source_key', ''),
         extra={"analysis_entry": analysis_entry}
     )
 
@@ -84,14 +127,16 @@ def format_analysis_results(results: Dict, analysis_timestamp: str) -> List[Dict
 def format_analysis_results1(results: List[Dict], analysis_timestamp: str) -> List[Dict]:
     """Format analysis results into standardized structure."""
     formatted_results = []
-    # Debug logging
-    logger.info(f"Results type: {type(results)}")
-    logger.info(f"Results content: {results}")
+    # Debug logging (gated so production INFO level skips the serialization)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Results type: {type(results)}")
+        logger.debug(f"Results content: {results}")
 
     for result in results:
         # Debug logging
-        logger.info(f"Result type: {type(result)}")
-        logger.info(f"Result content: {result}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Result type: {type(result)}")
+            logger.debug(f"Result content: {result}")
         analysis_entry = {
             "source_image": result.get('source_key', ''),
             "analysis": {
@@ -101,7 +146,8 @@ def format_analysis_results1(results: List[Dict], analysis_timestamp: str) -> Li
             }
         }
         logger.info(
-            f"Analysis completed for image {result.get('source_key', '')}", 
+            "Analysis completed for image %s",
+            result.get('source_key', ''),
             extra={"analysis_entry": analysis_entry}
         )
         formatted_results.append(analysis_entry)
@@ -121,75 +167,84 @@ def log_response(response: Dict, processing_duration: float, event: Dict):
         }
         
         # Log as JSON string for better CloudWatch insights
-        logger.info(f"Processing Complete - Full Response: {json.dumps(log_entry, indent=2)}")
+        logger.info(f"Processing Complete - Full Response: {orjson.dumps(log_entry).decode()}")
         
     except Exception as e:
         logger.error(f"Error logging response: {str(e)}")
 
 
 def lambda_handler(event: Dict, context: Any) -> Dict:
-    """Lambda handler for processing single image"""
-    start_time = datetime.datetime.now()
-    logger.info(">>> START EXECUTION >>> : %s",event)
+    """Lambda handler for processing the images referenced by an S3 event"""
+    start_time = time.monotonic()
+    logger.info(">>> START EXECUTION >>>")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received Event: %s", event)
 
     try:
-        # Extract source_key from S3 event
+        # Extract source keys from the S3 event (one record per image)
         try:
-            source_key = event['Records'][0]['s3']['object']['key']
-            logger.info(f"Extracted source_key: {source_key}")
-        except KeyError:
+            source_keys = [record['s3']['object']['key'] for record in event['Records']]
+            logger.info("Extracted source keys: %s", source_keys)
+        except (KeyError, TypeError):
             raise ValueError("Unable to extract image key from event")
-        
-        if not source_key:
+
+        if not source_keys or not all(source_keys):
             raise ValueError("image key cannot be empty")
 
-        # Initialize services
-        services = initialize_services()
-        logger.info("Services initialized successfully")
-        # Log the initialization of services
-        logger.info(
-            "Services initialized",
-            extra={
-                "s3_service": str(services['s3']),
-                "rekognition_service": str(services['rekognition']),
-                "bedrock_service": str(services['bedrock'])
-            }
-        )
-        # Initialize analyzer with services
-        analyzer = MultiImageDamageAnalyzer(
-            s3_service=services['s3'],
-            rekognition_service=services['rekognition'],
-            bedrock_service=services['bedrock']
-        )
+        # Reuse the cached analyzer (built on first use, kept across warm starts)
+        analyzer = get_analyzer()
 
         # Get configuration from environment variables
         source_bucket = os.getenv('SOURCE_BUCKET', 'damage-analyzer1124-test')
         output_bucket = os.getenv('OUTPUT_BUCKET', 'damage-analyzer1124-test')
 
-        logger.info(f"Source bucket: {source_bucket}, Output bucket: {output_bucket}")
+        logger.info("Source bucket: %s, Output bucket: %s", source_bucket, output_bucket)
 
         if not source_bucket or not output_bucket:
             raise ValueError("SOURCE_BUCKET and OUTPUT_BUCKET environment variables must be set")
 
 
-        # Perform analysis
-        # Perform analysis with source_key
-        analysis_results = analyzer.process_single_image(
-            source_bucket=source_bucket,
-            source_key=source_key,  # Pass the source_key here
-            output_bucket=output_bucket
-        )
-       # Calculate processing duration
-        processing_duration = (datetime.datetime.now() - start_time).total_seconds()
-
+        # Perform analysis; fan out across a thread pool when the event
+        # carries multiple records (the work is I/O-bound on S3/Rekognition/
+        # Bedrock, so images overlap instead of queueing)
+        if len(source_keys) == 1:
+            analysis_results = [analyzer.process_single_image(
+                source_bucket=source_bucket,
+                source_key=source_keys[0],
+                output_bucket=output_bucket
+            )]
+        else:
+            futures = [
+                _IMAGE_EXECUTOR.submit(
+                    analyzer.process_single_image,
+                    source_bucket=source_bucket,
+                    source_key=key,
+                    output_bucket=output_bucket
+                )
+                for key in source_keys
+            ]
+            # Wait for every submitted image before surfacing a failure, so
+            # a partial failure doesn't leave in-flight work to be frozen
+            # mid-call when the handler returns
+            analysis_results = []
+            first_error = None
+            for future in futures:
+                try:
+                    analysis_results.append(future.result())
+                except Exception as e:
+                    if first_error is None:
+                        first_error = e
+            if first_error is not None:
+                raise first_error
 
         # Format the results
         analysis_timestamp = datetime.datetime.now().isoformat()
-        formatted_results = format_analysis_results(analysis_results, analysis_timestamp)
+        formatted_results = []
+        for result in analysis_results:
+            formatted_results.extend(format_analysis_results(result, analysis_timestamp))
 
-        # Calculate processing duration
-        end_time = datetime.datetime.now()
-        processing_duration = (end_time - start_time).total_seconds()
+        # Calculate processing duration once, from the monotonic clock
+        processing_duration = time.monotonic() - start_time
 
         # Prepare the response
         response = {
@@ -205,15 +260,9 @@ def lambda_handler(event: Dict, context: Any) -> Dict:
             "headers": {"Content-Type": CONTENT_TYPE_JSON}
         }
 
-        # Log the final response
         # Log detailed response to CloudWatch
         log_response(response, processing_duration, event)
 
-        # Add headers to response
-        response["headers"] = {"Content-Type": "application/json"}
-        
-        # Convert body to JSON string for Lambda response
-        response["body"] = json.dumps(response["body"])
         return response
 
     except KeyError as e:
@@ -232,4 +281,12 @@ def lambda_handler(event: Dict, context: Any) -> Dict:
         return create_error_response(error_msg)
     
     finally:
+        # Drain the pipelined S3 deletes on every exit path: Lambda freezes
+        # the environment at return, which would strand the source images
+        # and let the S3 event re-fire for them
+        if _SERVICES is not None:
+            try:
+                _SERVICES['s3'].wait_for_pending_deletes()
+            except Exception as e:
+                logger.error(f"Error draining pending deletes: {str(e)}")
         logger.info("<<< END EXECUTION <<<")
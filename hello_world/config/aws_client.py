@@ -1,6 +1,7 @@
 # hello_world/config/aws_config.py
 import boto3
 import os
+import threading
 from botocore.config import Config
 import logging
 from botocore.exceptions import ClientError
@@ -10,20 +11,27 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+def get_max_pool_connections():
+    """Get connection pool size, overridable per deployment"""
+    return int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+
 def get_base_config():
     """Get base configuration for AWS clients"""
     return Config(
         retries=dict(
-            max_attempts=3
+            max_attempts=5,
+            mode='adaptive'
         ),
         connect_timeout=120,
-        read_timeout=120
+        read_timeout=120,
+        tcp_keepalive=True,
+        max_pool_connections=get_max_pool_connections()
     )
-def get_s3_client():
+def get_s3_client(session=None):
     """Initialize S3 client"""
     try:
         config = get_base_config()
-        s3_client = boto3.client(
+        s3_client = (session or boto3).client(
             service_name='s3',
             region_name=os.getenv('AWS_REGION', 'us-east-1'),
             config=config
@@ -34,11 +42,11 @@ def get_s3_client():
         logger.error(f"Failed to initialize S3 client: {str(e)}")
         raise Exception(f"Failed to initialize S3 client: {str(e)}")
     
-def get_rekognition_client():
+def get_rekognition_client(session=None):
     """Initialize Rekognition client"""
     try:
         config = get_base_config()
-        rekognition_client = boto3.client(
+        rekognition_client = (session or boto3).client(
             service_name='rekognition',
             region_name=os.getenv('AWS_REGION', 'us-east-1'),
             config=config
@@ -51,20 +59,22 @@ def get_rekognition_client():
 
     
 # config/aws_client.py
-def get_bedrock_client():
+def get_bedrock_client(session=None):
     """Initialize Bedrock runtime client"""
     try:
         config = Config(
             retries=dict(
-                max_attempts=3,  # Base retry attempts
+                max_attempts=5,  # Base retry attempts
                 mode='adaptive'  # Use adaptive mode for better handling
             ),
             connect_timeout=120,
             read_timeout=120,
+            tcp_keepalive=True,
+            max_pool_connections=get_max_pool_connections(),
             region_name=os.environ.get('AWS_REGION', 'us-east-1')
         )
         
-        bedrock_client = boto3.client(
+        bedrock_client = (session or boto3).client(
             service_name='bedrock-runtime',
             config=config
         )
@@ -75,22 +85,23 @@ def get_bedrock_client():
         raise
 
 def initialize_aws_clients():
-    """Initialize all AWS clients"""
+    """Initialize all AWS clients from one shared session
+
+    The shared session loads endpoint/partition data and the credential
+    resolver once instead of per client. Client construction is serial on
+    purpose: boto3 Sessions are not thread-safe, and concurrent
+    session.client() calls race in the loader/endpoint resolver.
+    """
     try:
-        clients = {}
-        
-        # Initialize S3
-        logger.info("Initializing S3 client...")
-        clients['s3'] = get_s3_client()
-        
-        # Initialize Rekognition
-        logger.info("Initializing Rekognition client...")
-        clients['rekognition'] = get_rekognition_client()
-        
-        # Initialize Bedrock
-        logger.info("Initializing Bedrock client...")
-        clients['bedrock'] = get_bedrock_client()
-        
+        logger.info("Initializing AWS clients...")
+        session = boto3.session.Session()
+        clients = {
+            's3': get_s3_client(session),
+            'rekognition': get_rekognition_client(session),
+            'bedrock': get_bedrock_client(session)
+        }
+
+        _clients.update(clients)
         logger.info("All AWS clients initialized successfully")
         return clients
 
@@ -98,9 +109,55 @@ def initialize_aws_clients():
         logger.error(f"Failed to initialize AWS clients: {str(e)}")
         raise
 
-# Create AWS session and initialize clients
-try:
-    aws_clients = initialize_aws_clients()
-except Exception as e:
-    logger.error(f"Failed to set up AWS environment: {str(e)}")
-    raise
+# Clients are built lazily on first use so cold starts only pay for the
+# services an invocation actually touches; built clients are cached here
+_clients = {}
+
+_CLIENT_FACTORIES = {
+    's3': get_s3_client,
+    'rekognition': get_rekognition_client,
+    'bedrock': get_bedrock_client
+}
+
+def get_client(name: str):
+    """Return the cached client for `name`, constructing it on first use"""
+    if name not in _clients:
+        factory = _CLIENT_FACTORIES.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown AWS client: {name}")
+        _clients[name] = factory()
+    return _clients[name]
+
+def prewarm_aws_clients():
+    """Force credential/endpoint resolution and prime a TLS connection
+
+    Boto3 resolves credentials and endpoints lazily on the first call per
+    client, adding 50-200ms to the first image processed after a cold
+    start. Invoked from module scope (opt-in via PREWARM_AWS_CLIENTS) this
+    moves that cost out of the request path.
+    """
+    try:
+        initialize_aws_clients()
+        # Any cheap authenticated call resolves the credential chain and
+        # leaves a warm TLS session behind (tcp_keepalive keeps it alive)
+        _clients['s3'].list_buckets()
+        logger.info("AWS clients prewarmed")
+    except Exception as e:
+        # Prewarming is best effort; real calls will retry resolution
+        logger.warning(f"AWS client prewarm failed: {str(e)}")
+
+# Per-thread clients, each with its own session and connection pool, so
+# worker threads don't contend on one shared pool under high fan-out
+_thread_local = threading.local()
+
+def get_thread_local_client(name: str):
+    """Return this thread's cached client for `name`, building it on first use"""
+    clients = getattr(_thread_local, 'clients', None)
+    if clients is None:
+        clients = _thread_local.clients = {}
+    if name not in clients:
+        factory = _CLIENT_FACTORIES.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown AWS client: {name}")
+        clients[name] = factory(boto3.session.Session())
+    return clients[name]
@@ -0,0 +1,106 @@
+from typing import Dict, List
+import logging
+
+import aioboto3
+
+from services.bedrock_service import BedrockService, BedrockServiceError
+
+logger = logging.getLogger(__name__)
+
+class AsyncBedrockService(BedrockService):
+    """
+    Async variant of BedrockService backed by aioboto3.
+
+    Blocking on a multi-second Bedrock round trip serializes work when a
+    batch of images is in flight; this variant lets callers overlap many
+    invoke_model calls with asyncio.gather on a single event loop. Prompt
+    and request-body preparation are inherited from BedrockService so the
+    two paths cannot drift.
+    """
+
+    def __init__(self, session: aioboto3.Session = None, max_tokens: int = 400,
+                 temperature: float = 0.2):
+        """
+        Initialize AsyncBedrockService
+
+        Use as an async context manager (`async with AsyncBedrockService(...)
+        as svc`) so one entered bedrock-runtime client, with its TLS pool,
+        serves every invoke for the lifetime of the block instead of being
+        rebuilt per call.
+
+        Args:
+            session: aioboto3 session; one session should be shared across
+                all async services in the process
+            max_tokens: Output token cap (see BedrockService)
+            temperature: Sampling temperature (see BedrockService)
+        """
+        super().__init__(client=None, max_tokens=max_tokens, temperature=temperature)
+        self.session = session or aioboto3.Session()
+        self._client_cm = None
+
+    async def __aenter__(self):
+        if self.client is None:
+            self._client_cm = self.session.client('bedrock-runtime')
+            self.client = await self._client_cm.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._client_cm is not None:
+            await self._client_cm.__aexit__(exc_type, exc, tb)
+            self._client_cm = None
+            self.client = None
+        return False
+
+    async def invoke_model(self, body_bytes: bytes) -> str:
+        """
+        Invoke Bedrock model asynchronously on the persistent entered client
+
+        Args:
+            body_bytes: JSON-encoded request body
+
+        Returns:
+            Model response text
+
+        Raises:
+            BedrockServiceError: If the model invocation fails, or the
+                service was not entered first
+        """
+        if self.client is None:
+            raise BedrockServiceError(
+                "AsyncBedrockService must be entered (async with) before invoking"
+            )
+        try:
+            response = await self.client.invoke_model(
+                modelId=self.model_id,
+                body=body_bytes
+            )
+            payload = await response['body'].read()
+            return self._parse_response(payload)
+        except BedrockServiceError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to invoke Bedrock model: {str(e)}")
+            raise BedrockServiceError(f"Failed to invoke Bedrock model: {str(e)}")
+
+    async def generate_report(self, image_bytes: bytes, damage_labels: List[Dict]) -> str:
+        """
+        Generate analysis report using Bedrock asynchronously
+
+        Args:
+            image_bytes: Image data in bytes
+            damage_labels: List of damage labels with confidence scores
+
+        Returns:
+            Generated damage assessment report
+
+        Raises:
+            ValueError: If inputs are invalid
+            BedrockServiceError: If the service fails
+        """
+        if not image_bytes:
+            raise ValueError("Image bytes cannot be empty")
+        if not damage_labels:
+            raise ValueError("Damage labels cannot be empty")
+
+        body_bytes = self.prepare_body_bytes(image_bytes, damage_labels)
+        return await self.invoke_model(body_bytes)
@@ -1,8 +1,7 @@
 from typing import Dict, List
-import base64
+import binascii
 import json
-import time
-import boto3
+import orjson
 import logging
 from botocore.exceptions import ClientError
 
@@ -13,19 +12,52 @@ class BedrockServiceError(Exception):
     pass
 
 class BedrockService:
-    def __init__(self, client, max_retries: int = 3, base_delay: int = 2):
+    # Invariant instructions live in a system block so the user turn only
+    # carries the per-image damage description. (No cache_control here:
+    # claude-3-sonnet is not in Bedrock's prompt-caching model set, and the
+    # prefix is well under the minimum cacheable length anyway.)
+    _SYSTEM_PROMPT = """Analyze the provided image for damage.
+
+                Provide a detailed damage assessment including:
+                1. Type and extent of damage
+                2. Estimated repair complexity
+                3. Potential repair cost range
+                4. Recommendations for next steps
+
+                Be specific and use the detected labels and their confidence levels as context."""
+
+    # Template for the variable user turn; only the damage description varies
+    _PROMPT_TEMPLATE = "Detected potential damage indicators: {damage}"
+
+    def __init__(self, client, max_tokens: int = 400, temperature: float = 0.2):
         """
         Initialize BedrockService
-        
+
         Args:
-            client: Boto3 Bedrock client
-            max_retries: Maximum number of retry attempts
-            base_delay: Base delay for exponential backoff
+            client: Boto3 Bedrock client (retries handled by botocore's
+                adaptive retry mode configured on the client)
+            max_tokens: Output token cap; damage reports rarely need more
+                than a few hundred tokens, and a tight cap cuts Bedrock
+                latency and per-token output cost
+            temperature: Sampling temperature; low for deterministic reports
         """
         self.client = client
         self.model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
-        self.max_retries = max_retries
-        self.base_delay = base_delay
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Pre-serialized request skeleton; per call only the base64 image
+        # and JSON-escaped prompt are spliced in, skipping a full dict
+        # build + json.dumps traversal of the multi-MB body
+        self._body_template = (
+            '{"anthropic_version":"bedrock-2023-05-31"'
+            f',"max_tokens":{max_tokens},"temperature":{temperature}'
+            ',"system":[{"type":"text","text":'
+            f'{json.dumps(self._SYSTEM_PROMPT)}'
+            '}]'
+            ',"messages":[{"role":"user","content":['
+            '{"type":"image","source":{"type":"base64","media_type":"image/jpeg","data":"%s"}},'
+            '{"type":"text","text":%s}]}]}'
+        )
 
     def _prepare_prompt(self, damage_labels: List[Dict]) -> str:
         """
@@ -39,117 +71,102 @@ class BedrockService:
         """
         try:
             # Format damage labels with confidence scores
-            damage_details = [
+            damage_description = ', '.join(
                 f"{label['Name']} (Confidence: {label.get('Confidence', 0):.1f}%)"
                 for label in damage_labels
-            ]
-            damage_description = ', '.join(damage_details)
-
-            return f"""Analyze the following image for damage. Detected potential damage indicators: {damage_description}
-
-                Provide a detailed damage assessment including:
-                1. Type and extent of damage
-                2. Estimated repair complexity
-                3. Potential repair cost range
-                4. Recommendations for next steps
+            )
 
-                Be specific and use the detected labels and their confidence levels as context."""
+            return self._PROMPT_TEMPLATE.format(damage=damage_description)
         except Exception as e:
             logger.error(f"Error preparing prompt: {str(e)}")
             raise BedrockServiceError(f"Failed to prepare prompt: {str(e)}")
 
-    def _prepare_request_body(self, image_bytes: bytes, prompt: str) -> dict:
+    def prepare_body_bytes(self, image_bytes: bytes, damage_labels: List[Dict]) -> bytes:
         """
-        Prepare the request body for Bedrock API
-        
+        Build the JSON-encoded request body for an invoke_model call by
+        splicing the image and prompt into the pre-serialized skeleton
+
         Args:
             image_bytes: Image data in bytes
-            prompt: Formatted prompt string
-        
+            damage_labels: List of damage labels with confidence scores
+
         Returns:
-            Request body dictionary
+            Serialized request body, ready to send
         """
         if not isinstance(image_bytes, bytes):
             raise ValueError("image_bytes must be bytes")
+
+        prompt = self._prepare_prompt(damage_labels)
         if not prompt:
             raise ValueError("prompt cannot be empty")
-        
+
         try:
-            base64_image = base64.b64encode(image_bytes).decode('utf-8')
+            # b2a_base64 avoids the extra intermediate copy of b64encode + decode
+            base64_image = binascii.b2a_base64(image_bytes, newline=False).decode('ascii')
         except Exception as e:
             raise ValueError(f"Failed to encode image: {str(e)}")
-        
-        return {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 1000,
-            "temperature": 0.7,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": base64_image
-                            }
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ]
-                }
-            ]
-        }
-
-    def _invoke_bedrock_model(self, body: dict) -> str:
+
+        body = self._body_template % (base64_image, json.dumps(prompt))
+        return body.encode('utf-8')
+
+    def _parse_response(self, payload: bytes) -> str:
         """
-        Invoke Bedrock model with retry logic
-        
+        Extract the generated text from a raw Bedrock response payload
+
         Args:
-            body: Request body
-        
+            payload: Raw response body bytes
+
         Returns:
             Model response text
-        
+
+        Raises:
+            BedrockServiceError: If the response structure is unexpected
+        """
+        response_body = orjson.loads(payload)
+
+        # Detailed logging; the full dump is gated so INFO level never pays
+        # for serializing the response
+        logger.info("Response keys: %s", response_body.keys())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Full response: %s", json.dumps(response_body, indent=2))
+
+        # Handle different possible response structures
+        if 'messages' in response_body:
+            return response_body['messages'][0]['content'][0]['text']
+        elif 'content' in response_body:
+            return response_body['content'][0]['text']
+        else:
+            logger.error(f"Unexpected response structure. Available keys: {response_body.keys()}")
+            raise BedrockServiceError("Unexpected response structure from Bedrock")
+
+    def _invoke_bedrock_model(self, body_bytes: bytes) -> str:
+        """
+        Invoke Bedrock model
+
+        Retries (including throttling backoff) are handled by botocore's
+        adaptive retry mode on the client, so this performs a single call.
+        The body is pre-serialized bytes so retries never re-encode the
+        multi-MB request.
+
+        Args:
+            body_bytes: JSON-encoded request body
+
+        Returns:
+            Model response text
+
         Raises:
             BedrockServiceError: If the model invocation fails
         """
-        for attempt in range(self.max_retries):
-            try:
-                response = self.client.invoke_model(
-                    modelId=self.model_id,
-                    body=json.dumps(body)
-                )
-                response_body = json.loads(response.get('body').read())
-                
-                # Detailed logging
-                logger.info(f"Response keys: {response_body.keys()}")
-                logger.debug(f"Full response: {json.dumps(response_body, indent=2)}")
-                
-                # Handle different possible response structures
-                if 'messages' in response_body:
-                    return response_body['messages'][0]['content'][0]['text']
-                elif 'content' in response_body:
-                    return response_body['content'][0]['text']
-                else:
-                    logger.error(f"Unexpected response structure. Available keys: {response_body.keys()}")
-                    raise BedrockServiceError("Unexpected response structure from Bedrock")
-                    
-            except ClientError as e:
-                if attempt == self.max_retries - 1:  # Last attempt
-                    logger.error(f"Final attempt failed: {str(e)}")
-                    raise BedrockServiceError(f"Failed to invoke Bedrock model: {str(e)}")
-                logger.warning(f"Attempt {attempt + 1} failed, retrying...")
-                time.sleep(self.base_delay ** attempt)  # Exponential backoff
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    logger.error(f"Unexpected error in invoke_bedrock_model: {str(e)}")
-                    raise BedrockServiceError(f"Unexpected error: {str(e)}")
-                logger.warning(f"Unexpected error, retrying... {str(e)}")
-                time.sleep(self.base_delay ** attempt)
+        try:
+            response = self.client.invoke_model(
+                modelId=self.model_id,
+                body=body_bytes
+            )
+            return self._parse_response(response.get('body').read())
+
+        except ClientError as e:
+            logger.error(f"Failed to invoke Bedrock model: {str(e)}")
+            raise BedrockServiceError(f"Failed to invoke Bedrock model: {str(e)}")
 
     def generate_report(self, image_bytes: bytes, damage_labels: List[Dict]) -> str:
         """
@@ -173,23 +190,15 @@ class BedrockService:
             if not damage_labels:
                 raise ValueError("Damage labels cannot be empty")
             
-            # Prepare prompt and request body
-            prompt = self._prepare_prompt(damage_labels)
-            body = self._prepare_request_body(image_bytes, prompt)
-            
+            # Prepare prompt and request body, serialized once up front
+            body_bytes = self.prepare_body_bytes(image_bytes, damage_labels)
+
             # Invoke model and get response
-            return self._invoke_bedrock_model(body)
+            return self._invoke_bedrock_model(body_bytes)
             
         except (ValueError, BedrockServiceError) as e:
             logger.error(f"Error generating report: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Unexpected error in generate_report: {str(e)}")
-            raise BedrockServiceError(f"Unexpected error in generate_report: {str(e)}")
-
-# Initialize the service
-bedrock_client = boto3.client('bedrock-runtime')
-bedrock_service = BedrockService(
-    client=bedrock_client
-)
-
+            raise BedrockServiceError(f"Unexpected error in generate_report: {str(e)}")
\ No newline at end of file
@@ -1,151 +1,170 @@
-from typing import List,Dict,Union 
-import logging 
-from datetime import datetime 
-from botocore.exceptions import ClientError, BotoCoreError
-logger = logging.getLogger(__name__) 
-
-class RekognitionService: 
-    def __init__(self, rekognition_client):  
-        self.client = rekognition_client  
-        self.damage_keywords = [
-                                    # Physical damage
-                                    'damage', 'crack', 'scratch', 'dent', 'broken', 'chip', 'split', 'tear', 
-                                    'puncture', 'gouge', 'rupture', 'fissure', 'fracture', 'destroyed',
-                                    
-                                    # Surface-specific damage
-                                    'rust', 'corrosion', 'wear', 'deterioration', 'degradation', 'erosion', 
-                                    'stain', 'discoloration', 'peeling', 'chipped paint', 'surface damage',
-                                    
-                                    # Structural damage
-                                    'deformation', 'warped', 'bent', 'misaligned', 'collapsed', 'buckled', 
-                                    'twisted', 'structural failure', 'compromised',
-                                    
-                                    # Material-specific damage
-                                    'shattered', 'cracked glass', 'metal fatigue', 'material failure', 
-                                    'structural weakness', 'fragmented',
-                                    
-                                    # Contextual damage indicators
-                                    'impact', 'collision', 'accident', 'trauma', 'stress', 'strain', 
-                                    'mechanical failure', 'structural compromise'
-        ]
-
-    def detect_damage(self, image: Union[Dict, bytes], source_type: str = 's3') -> List[Dict]:
-        """
-        Detect damage in image using Rekognition
-        source_type: 's3' or 'bytes'
-        """
-        try:
-            # Prepare image input based on source type
-            image_input = {}
-            if source_type == 's3':
-                image_input = {
-                    'S3Object': {
-                        'Bucket': image['Bucket'],
-                        'Name': image['Name']
-                    }
-                }
-            elif source_type == 'bytes':
-                image_input = {'Bytes': image}
-            else:
-                raise ValueError(f"Invalid source_type: {source_type}")
-
-            # Call Rekognition
-            response = self.client.detect_labels(
-                Image=image_input,
-                MaxLabels=20,
-                MinConfidence=70
-            )
-
-            # Filter for damage-related labels
-            damage_labels = [
-                label for label in response['Labels']
-                if any(damage_term in label['Name'].lower() 
-                      for damage_term in ['damage', 'dent', 'scratch', 'broken', 'crack'])
-            ]
-
-            logger.info(f"Detected {len(damage_labels)} damage-related labels")
-            return damage_labels
-
-        except ClientError as e:
-            logger.error(f"Rekognition API error: {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error in damage detection: {str(e)}")
-            raise
-        finally:
-            logger.info("Damage detection completed")
-            
-    def detect_damage1(self, image: Union[Dict, bytes], source_type: str = 's3') -> List[Dict]: 
-        """
-        Detect damage using Rekognition
-        :param image: Image source (S3 object reference or image bytes)
-        :param source_type: 's3' or 'bytes'
-        :return: List of damage-related labels
-        :raises: ValueError, ImageTooLargeException, InvalidImageFormatException
-
-        """
-        try: 
-            # Validate inputs
-            if not image:
-                raise ValueError("Image parameter cannot be empty")
-            # Prepare image reference based on source type
-            if source_type == 's3':  
-                if not isinstance(image, dict) or 'Bucket' not in image or 'Name' not in image:
-                    raise ValueError("S3 image reference must contain 'Bucket' and 'Name' keys")
-                image_reference = {'S3Object': image}
-
-            elif source_type == 'bytes': 
-                if not isinstance(image, bytes):
-                    raise ValueError("Image must be bytes when source_type is 'bytes'")
-                image_reference = {'Bytes': image} 
-            else: 
-                raise ValueError("Invalid source type. Use 's3' or 'bytes'.")  
-            
-            try:
-                response = self.client.detect_labels(  
-                    Image=image_reference,  
-                    MaxLabels=10,  
-                    MinConfidence=70.0 
-                ) 
-            except ClientError as e:
-                error_code = ce.response['Error']['Code']
-                if error_code == 'InvalidImageFormatException':
-                    logger.error("Invalid image format provided")
-                    raise ValueError("Invalid image format. Please provide a valid image file.")
-                elif error_code == 'ImageTooLargeException':
-                    logger.error("Image size exceeds maximum allowed size")
-                    raise ValueError("Image size is too large. Maximum size is 5MB for direct uploads.")
-                elif error_code == 'InvalidS3ObjectException':
-                    logger.error("Invalid S3 object reference")
-                    raise ValueError("Unable to access the S3 object. Please check permissions and if the object exists.")
-                elif error_code == 'InvalidParameterException':
-                    logger.error(f"Invalid parameter: {ce}")
-                    raise ValueError("Invalid parameters provided to Rekognition service.")
-                else:
-                    logger.error(f"AWS Rekognition ClientError: {ce}")
-                    raise
-             
-            except BotoCoreError as be:
-                logger.error(f"AWS BotoCore error: {be}")
-                raise ValueError("AWS service error occurred. Please try again later.")
-     
-            if not response or 'Labels' not in response:
-                logger.warning("No labels found in the Rekognition response")
-                return []
-
-            # Process and filter damage-related labels
-            try:
-                damage_labels = [
-                    label for label in response['Labels']
-                    if any(keyword in label['Name'].lower() for keyword in self.damage_keywords)
-                ]
-                
-                logger.info(f"Found {len(damage_labels)} damage-related labels")
-                return damage_labels
-                
-            except Exception as e:
-                logger.error(f"Error processing labels: {e}")
-                raise ValueError("Error processing Rekognition response")
-        except Exception as e:
-                logger.error(f"Unexpected error in detect_damage: {e}")
-                raise
\ No newline at end of file
+from typing import List,Dict,Union
+import logging
+import re
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from botocore.exceptions import ClientError, BotoCoreError
+logger = logging.getLogger(__name__)
+
+class RekognitionService: 
+    def __init__(self, rekognition_client):
+        self.client = rekognition_client
+        # Sliding-window limiter keeping DetectLabels under the account's
+        # requests-per-second quota when dispatched concurrently
+        self._rate_lock = threading.Lock()
+        self._call_times = deque()
+        # Results keyed by S3 ETag so replays of a byte-identical image
+        # skip the Rekognition round trip (and its per-call charge)
+        self._result_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # DetectLabels requests per second (default Rekognition quota)
+    _RATE_LIMIT_CALLS_PER_SECOND = 50
+
+    # Bounded ETag cache; LRU eviction past this many entries
+    _RESULT_CACHE_MAX_ENTRIES = 10000
+
+    def _cache_get(self, etag):
+        with self._cache_lock:
+            if etag in self._result_cache:
+                self._result_cache.move_to_end(etag)
+                return self._result_cache[etag]
+        return None
+
+    def _cache_put(self, etag, damage_labels):
+        with self._cache_lock:
+            self._result_cache[etag] = damage_labels
+            self._result_cache.move_to_end(etag)
+            while len(self._result_cache) > self._RESULT_CACHE_MAX_ENTRIES:
+                self._result_cache.popitem(last=False)
+
+    def _acquire_rate_slot(self):
+        """Block until a DetectLabels call fits within the rate limit"""
+        while True:
+            with self._rate_lock:
+                now = time.monotonic()
+                while self._call_times and now - self._call_times[0] >= 1.0:
+                    self._call_times.popleft()
+                if len(self._call_times) < self._RATE_LIMIT_CALLS_PER_SECOND:
+                    self._call_times.append(now)
+                    return
+                wait = 1.0 - (now - self._call_times[0])
+            time.sleep(wait)
+
+    def detect_damage_many(self, images: List[Union[Dict, bytes]], source_type: str = 's3') -> List[List[Dict]]:
+        """
+        Detect damage in many images with bounded, rate-limited concurrency
+
+        Rekognition has no server-side batch API, so concurrent client-side
+        dispatch against the shared (thread-safe, pooled) client is the
+        effective batch; results are returned in input order and a failing
+        image raises, matching detect_damage.
+        """
+        max_workers = min(self._RATE_LIMIT_CALLS_PER_SECOND, len(images)) or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda image: self.detect_damage(image, source_type),
+                images
+            ))
+
+    # Compiled once for the filter used on DetectLabels responses (kept
+    # narrow on purpose: these labels feed the Bedrock prompt directly)
+    _FAST_DAMAGE_RE = re.compile('damage|dent|scratch|broken|crack', re.IGNORECASE)
+
+    # Whole-word fast path: a C-level set disjointness check over the
+    # label's tokens settles the common case before the regex scan, which
+    # remains as the fallback for within-word matches like "cracked"
+    _KEYWORD_TOKENS = frozenset(['damage', 'dent', 'scratch', 'broken', 'crack'])
+
+    def _is_damage_name(self, name: str) -> bool:
+        return (not self._KEYWORD_TOKENS.isdisjoint(name.lower().split())
+                or self._FAST_DAMAGE_RE.search(name) is not None)
+
+    def filter_damage_labels(self, labels: List[Dict]) -> List[Dict]:
+        """
+        Keep only damage-related labels from a DetectLabels response,
+        projected down to Name and Confidence
+
+        Downstream only the name and confidence matter (they are all the
+        Bedrock prompt and the response formatting use); dropping the
+        BoundingBox/Parents/Categories payload keeps the labels cheap to
+        carry and serialize.
+        """
+        return [
+            {'Name': label['Name'], 'Confidence': label.get('Confidence', 0.0)}
+            for label in labels
+            if self._is_damage_name(label['Name'])
+        ]
+
+    def detect_damage(self, image: Union[Dict, bytes], source_type: str = 's3', etag: str = None) -> List[Dict]:
+        """
+        Detect damage in image using Rekognition
+        source_type: 's3' or 'bytes'
+        etag: optional S3 ETag of the image; when given, byte-identical
+              replays are served from the local result cache
+        """
+        try:
+            if etag is not None:
+                cached = self._cache_get(etag)
+                if cached is not None:
+                    logger.info("Rekognition cache hit for etag %s", etag)
+                    return cached
+
+            # Prepare image input based on source type
+            image_input = {}
+            if source_type == 's3':
+                image_input = {
+                    'S3Object': {
+                        'Bucket': image['Bucket'],
+                        'Name': image['Name']
+                    }
+                }
+            elif source_type == 'bytes':
+                image_input = {'Bytes': image}
+            else:
+                raise ValueError(f"Invalid source_type: {source_type}")
+
+            # Call Rekognition, pacing to stay under the service quota
+            self._acquire_rate_slot()
+            response = self.client.detect_labels(
+                Image=image_input,
+                MaxLabels=20,
+                MinConfidence=70
+            )
+
+            # Filter for damage-related labels
+            damage_labels = self.filter_damage_labels(response['Labels'])
+
+            if etag is not None:
+                self._cache_put(etag, damage_labels)
+
+            logger.info("Detected %d damage-related labels", len(damage_labels))
+            return damage_labels
+
+        except ClientError as e:
+            # Translate the well-known client errors into ValueErrors the
+            # handler already maps to clean 500s with actionable messages
+            error_code = e.response['Error']['Code']
+            if error_code == 'InvalidImageFormatException':
+                logger.error("Invalid image format provided")
+                raise ValueError("Invalid image format. Please provide a valid image file.")
+            elif error_code == 'ImageTooLargeException':
+                logger.error("Image size exceeds maximum allowed size")
+                raise ValueError("Image size is too large. Maximum size is 5MB for direct uploads.")
+            elif error_code == 'InvalidS3ObjectException':
+                logger.error("Invalid S3 object reference")
+                raise ValueError("Unable to access the S3 object. Please check permissions and if the object exists.")
+            elif error_code == 'InvalidParameterException':
+                logger.error(f"Invalid parameter: {e}")
+                raise ValueError("Invalid parameters provided to Rekognition service.")
+            logger.error(f"Rekognition API error: {str(e)}")
+            raise
+        except BotoCoreError as e:
+            logger.error(f"AWS BotoCore error: {e}")
+            raise ValueError("AWS service error occurred. Please try again later.")
+        except Exception as e:
+            logger.error(f"Unexpected error in damage detection: {str(e)}")
+            raise
\ No newline at end of file
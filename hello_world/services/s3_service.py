@@ -1,68 +1,308 @@
-from typing import Optional,List
-import logging
-
-logger = logging.getLogger(__name__)
-
-class S3Service:
-    def __init__(self, s3_client):
-        self.s3_client = s3_client
-
-    def read_image(self, bucket: str, key: str) -> bytes: 
-        """Read image from S3 bucket""" 
-        try:  
-            response = self.s3_client.get_object(Bucket=bucket, Key=key) 
-            return response['Body'].read() 
-        except Exception as e:
-            logger.error(f"Error reading from S3: {e}") 
-            raise
-    
-    def move_file(self, bucket: str, source_key: str, destination_key: str) -> bool:
-        """
-        Move file within the same bucket from source_key to destination_key
-        """
-        try:
-            # Copy the object to the new location
-            self.s3_client.copy_object(
-                Bucket=bucket,
-                CopySource={'Bucket': bucket, 'Key': source_key},
-                Key=destination_key
-            )
-            
-            # Delete the original object
-            self.s3_client.delete_object(
-                Bucket=bucket,
-                Key=source_key
-            )
-            
-            logger.info(f"Successfully moved {source_key} to {destination_key}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to move file from {source_key} to {destination_key}: {str(e)}")
-            return False
-            
-    def upload_file(self, file_name: str, bucket: str, object_name: Optional[str] = None) -> bool:
-        if object_name is None:
-            object_name = file_name
-        try:
-            self.s3_client.upload_file(file_name, bucket, object_name)
-            logger.info(f"File {file_name} uploaded to {bucket}/{object_name}")
-            return True
-        except Exception as e:
-            logger.error(f"Error uploading file {file_name} to {bucket}/{object_name}: {e}")
-            return False
-
-    def upload_text(self, bucket: str, key: str, text_content: str) -> bool:
-        """Upload text content to S3"""
-        try:
-            self.s3_client.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=text_content.encode('utf-8'),
-                ContentType='text/plain'
-            )
-            logger.info(f"Successfully uploaded text content to {bucket}/{key}")
-            return True
-        except Exception as e:
-            logger.error(f"Error uploading text content to {bucket}/{key}: {e}")
+from typing import Optional,List
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+class S3Service:
+    # Objects above this size are fetched with concurrent byte-range GETs;
+    # single-stream S3 reads cap out well below the Lambda network budget
+    PARALLEL_READ_THRESHOLD = 2 * 1024 * 1024
+
+    # Objects above this size go through boto3's transfer manager, which
+    # handles multipart download (and retry per part) for us
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+    _TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        max_concurrency=8,
+        use_threads=True
+    )
+
+    # Shared executor for deletes pipelined off the move critical path
+    # and for read_image_async futures
+    _DELETE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+    _READ_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+    def __init__(self, s3_client=None, client_factory=None):
+        """
+        Wrap either a fixed client or a per-call factory
+
+        Passing `client_factory` (e.g. config.aws_client.get_thread_local_client)
+        gives each worker thread its own client and connection pool, which
+        flattens tail latency when the service is driven from a thread pool.
+        """
+        if s3_client is None and client_factory is None:
+            raise ValueError("Either s3_client or client_factory is required")
+        self._s3_client = s3_client
+        self._client_factory = client_factory
+        self._pending_deletes = []
+        self._pending_deletes_lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        if self._client_factory is not None:
+            return self._client_factory()
+        return self._s3_client
+
+    def read_image(self, bucket: str, key: str) -> bytes:
+        """Read image from S3 bucket, in parallel parts when large"""
+        return self.read_image_with_etag(bucket, key)[0]
+
+    def read_image_with_etag(self, bucket: str, key: str):
+        """
+        Read image from S3 and return (bytes, etag)
+
+        The ETag identifies the object content, letting callers key caches
+        (e.g. Rekognition results) on content identity across replays.
+        Size and ETag come off the initial GET response, so the common
+        small-image path pays no extra round trip; only large objects
+        abandon that stream and re-fetch in parallel parts.
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            size = response['ContentLength']
+            etag = response['ETag'].strip('"')
+            if size <= self.PARALLEL_READ_THRESHOLD:
+                return response['Body'].read(), etag
+            response['Body'].close()
+            if size > self.MULTIPART_THRESHOLD:
+                buffer = io.BytesIO()
+                self.s3_client.download_fileobj(
+                    bucket, key, buffer, Config=self._TRANSFER_CONFIG
+                )
+                return buffer.getvalue(), etag
+            return self.get_object_parallel(bucket, key, size=size), etag
+        except Exception as e:
+            logger.error(f"Error reading from S3: {e}")
+            raise
+
+    def list_jpg_images(self, source_bucket: str, prefix: str = 'damage_images/') -> List[str]:
+        """
+        List JPG image keys under a prefix
+
+        Uses a paginator so buckets with more than 1000 objects are fully
+        enumerated, and scopes the listing server-side with the prefix so
+        non-image keys never cross the wire.
+        """
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            return [
+                obj['Key']
+                for page in paginator.paginate(Bucket=source_bucket, Prefix=prefix)
+                for obj in page.get('Contents', [])
+                if obj['Key'].lower().endswith(('.jpg', '.jpeg'))
+            ]
+        except Exception as e:
+            logger.error(f"Error listing images in {source_bucket}/{prefix}: {e}")
+            raise
+
+    def select_json(self, bucket: str, key: str, sql: str) -> str:
+        """
+        Run an S3 Select expression against a JSON object and return the
+        selected records
+
+        For structured sidecar objects (metadata, report indexes) this pulls
+        only the matching subset over the wire instead of the whole object;
+        raw image bytes still go through read_image.
+        """
+        try:
+            response = self.s3_client.select_object_content(
+                Bucket=bucket,
+                Key=key,
+                Expression=sql,
+                ExpressionType='SQL',
+                InputSerialization={'JSON': {'Type': 'DOCUMENT'}},
+                OutputSerialization={'JSON': {}}
+            )
+            records = []
+            for event in response['Payload']:
+                if 'Records' in event:
+                    records.append(event['Records']['Payload'])
+            return b''.join(records).decode('utf-8')
+        except Exception as e:
+            logger.error(f"Error selecting from {bucket}/{key}: {e}")
+            raise
+
+    def read_image_async(self, bucket: str, key: str) -> Future:
+        """
+        Start a read on the shared executor and return a future, so callers
+        can overlap the download with other per-image work
+        """
+        return self._READ_EXECUTOR.submit(self.read_image, bucket, key)
+
+    def get_object_parallel(self, bucket: str, key: str, part_size: int = 4 * 1024 * 1024, concurrency: int = 8, size: int = None) -> bytes:
+        """
+        Download an object with concurrent byte-range GETs
+
+        Ranges within one Lambda don't contend for S3 bandwidth, so this
+        scales near-linearly up to the function's network cap. Pass `size`
+        when already known to skip the HeadObject round trip.
+        """
+        try:
+            # Resolve the client once in the calling thread; with a
+            # thread-local client_factory, resolving inside fetch_range
+            # would build a throwaway session per worker thread instead
+            client = self.s3_client
+            if size is None:
+                size = client.head_object(Bucket=bucket, Key=key)['ContentLength']
+            buffer = bytearray(size)
+
+            def fetch_range(start: int):
+                end = min(start + part_size, size) - 1
+                response = client.get_object(
+                    Bucket=bucket,
+                    Key=key,
+                    Range=f'bytes={start}-{end}'
+                )
+                buffer[start:end + 1] = response['Body'].read()
+
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(fetch_range, range(0, size, part_size)))
+
+            return bytes(buffer)
+        except Exception as e:
+            logger.error(f"Error reading {bucket}/{key} in parallel ranges: {e}")
+            raise
+    
+    def _delete_in_background(self, bucket: str, key: str):
+        """Issue a delete on the shared background executor"""
+        def delete():
+            try:
+                self.s3_client.delete_object(Bucket=bucket, Key=key)
+            except Exception as e:
+                logger.error(f"Background delete failed for {bucket}/{key}: {str(e)}")
+        future = self._DELETE_EXECUTOR.submit(delete)
+        with self._pending_deletes_lock:
+            self._pending_deletes.append(future)
+
+    def wait_for_pending_deletes(self):
+        """Block until all backgrounded deletes have run
+
+        Lambda freezes the execution environment the moment the handler
+        returns, so callers there must drain the queue before returning or
+        the source objects survive and can re-trigger the S3 event.
+        """
+        with self._pending_deletes_lock:
+            pending, self._pending_deletes = self._pending_deletes, []
+        for future in pending:
+            future.result()
+
+    def _copy_large_object(self, bucket: str, source_key: str, destination_key: str, size: int, part_size: int = 1024 ** 3):
+        """Server-side multipart copy for objects above the 5GB CopyObject limit"""
+        upload = self.s3_client.create_multipart_upload(Bucket=bucket, Key=destination_key)
+        upload_id = upload['UploadId']
+        try:
+            parts = []
+            for part_number, start in enumerate(range(0, size, part_size), start=1):
+                end = min(start + part_size, size) - 1
+                part = self.s3_client.upload_part_copy(
+                    Bucket=bucket,
+                    Key=destination_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    CopySource={'Bucket': bucket, 'Key': source_key},
+                    CopySourceRange=f'bytes={start}-{end}'
+                )
+                parts.append({'ETag': part['CopyPartResult']['ETag'], 'PartNumber': part_number})
+            self.s3_client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=destination_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.s3_client.abort_multipart_upload(
+                Bucket=bucket, Key=destination_key, UploadId=upload_id
+            )
+            raise
+
+    def move_file(self, bucket: str, source_key: str, destination_key: str) -> bool:
+        """
+        Move file within the same bucket from source_key to destination_key
+
+        The delete of the original is pipelined onto a background thread
+        once the copy is acknowledged, so the caller doesn't pay the second
+        round trip; the move is considered successful at copy time.
+        """
+        # No-op on identical keys (seen on retries/idempotent replays);
+        # copy+delete here would delete the object outright
+        if source_key == destination_key:
+            logger.info("Skipping move of %s: already at destination", source_key)
+            return True
+
+        try:
+            # Copy the object to the new location; only if S3 rejects the
+            # copy for exceeding the 5GB CopyObject limit do we pay a head
+            # and fall back to multipart copy (nothing in this pipeline
+            # should get near that, so the common move stays one call)
+            try:
+                self.s3_client.copy_object(
+                    Bucket=bucket,
+                    CopySource={'Bucket': bucket, 'Key': source_key},
+                    Key=destination_key
+                )
+            except ClientError as e:
+                error = e.response.get('Error', {})
+                if error.get('Code') == 'InvalidRequest' and 'copy source' in error.get('Message', '').lower():
+                    size = self.s3_client.head_object(Bucket=bucket, Key=source_key)['ContentLength']
+                    self._copy_large_object(bucket, source_key, destination_key, size)
+                else:
+                    raise
+
+            # Delete the original object off the critical path
+            self._delete_in_background(bucket, source_key)
+
+            logger.info("Successfully moved %s to %s", source_key, destination_key)
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to move file from {source_key} to {destination_key}: {str(e)}")
+            return False
+
+    def move_files_batch(self, bucket: str, pairs: List[tuple], max_workers: int = 16) -> List[bool]:
+        """
+        Move many (source_key, destination_key) pairs concurrently
+
+        Bookkeeping moves for a large batch are pure per-object round trips,
+        so fanning them out across threads collapses the wall time to the
+        slowest copy instead of the sum.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda pair: self.move_file(bucket, pair[0], pair[1]),
+                pairs
+            ))
+            
+    def upload_file(self, file_name: str, bucket: str, object_name: Optional[str] = None) -> bool:
+        if object_name is None:
+            object_name = file_name
+        try:
+            self.s3_client.upload_file(file_name, bucket, object_name)
+            logger.info("File %s uploaded to %s/%s", file_name, bucket, object_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error uploading file {file_name} to {bucket}/{object_name}: {e}")
+            return False
+
+    def upload_text(self, bucket: str, key: str, text_content: str) -> bool:
+        """Upload text content to S3"""
+        try:
+            # Hand boto3 a file-like body so it can stream/chunk the upload
+            # instead of holding a second full copy of large reports
+            self.s3_client.put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=io.BytesIO(text_content.encode('utf-8')),
+                ContentType='text/plain; charset=utf-8',
+                ContentEncoding='utf-8'
+            )
+            logger.info("Successfully uploaded text content to %s/%s", bucket, key)
+            return True
+        except Exception as e:
+            logger.error(f"Error uploading text content to {bucket}/{key}: {e}")
             return False
\ No newline at end of file